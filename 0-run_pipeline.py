@@ -9,15 +9,34 @@
 #     4-sampling_rate_evaluation.py
 #     5-interpol_resample_120Hz.py
 #     6-compare_60hz_vs_120hz.py
+#     7-envelope_statistics.py
 #   Espera um pequeno intervalo entre etapas.
+#
+#   Execução distribuída (várias máquinas/processos):
+#     --shard i/N  processa só os cenários do shard i (1..N), escolhidos
+#                  por hash estável (CRC32) do nome do arquivo; grava
+#                  manifesto e relatório em shards/shard_i_de_N/.
+#     --merge [N]  combina os resultados dos N shards (manifestos,
+#                  relatórios, resumo de deltaTempo e envelope); sem N,
+#                  usa o único N presente em shards/.
 # ================================================================
 
+import os
+import re
 import sys
+import json
 import time
 import argparse
+import platform
 import subprocess
+from collections import Counter
+from datetime import datetime
 from pathlib import Path
 
+import pandas as pd
+
+from sips_utils import VAR_AMBIENTE_SHARD, nome_cenario, parse_shard, rotulo_shard, shard_do_cenario
+
 SCRIPTS = [
     "1-rename_plt_headers.py",
     "2-plt_to_parquet.py",
@@ -25,18 +44,135 @@ SCRIPTS = [
     "4-sampling_rate_evaluation.py",
     "5-interpol_resample_120Hz.py",
     "6-compare_60hz_vs_120hz.py",
+    "7-envelope_statistics.py",
 ]
 
-def run_script(script_path: Path) -> int:
+PASTA_SHARDS = "shards"
+
+def run_script(script_path: Path, env: dict | None = None, extra_args: list[str] | None = None) -> int:
     """Executa um script Python com o mesmo interpretador, retornando o código de saída."""
     print(f"\n▶️  Rodando: {script_path.name}")
     print("-" * 72)
     # stdout/stderr = None -> herda do console e imprime em tempo real
-    proc = subprocess.run([sys.executable, str(script_path)], cwd=script_path.parent)
+    cmd = [sys.executable, str(script_path)] + (extra_args or [])
+    proc = subprocess.run(cmd, cwd=script_path.parent, env=env)
     print("-" * 72)
     print(f"🔚 Finalizado: {script_path.name} (exit code={proc.returncode})")
     return proc.returncode
 
+def tipo_shard(valor: str) -> tuple[int, int]:
+    """Tipo do argparse para --shard (mesma validação das etapas)."""
+    try:
+        return parse_shard(valor)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def listar_cenarios(base_dir: Path) -> list[str]:
+    """Arquivos .plt em data_raw/ (entrada da etapa 1)."""
+    pasta = base_dir / "data_raw"
+    if not pasta.is_dir():
+        return []
+    return sorted(p.name for p in pasta.iterdir() if p.suffix.lower() == ".plt")
+
+def salvar_json(caminho: Path, dados: dict) -> None:
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(dados, f, indent=2, ensure_ascii=False)
+
+def n_shards_disponiveis(pasta: Path) -> list[int]:
+    """Valores de N com pastas shard_i_de_N em shards/."""
+    encontrados = (re.fullmatch(r"shard_\d+_de_(\d+)", p.name) for p in pasta.glob("shard_*"))
+    return sorted({int(m.group(1)) for m in encontrados if m})
+
+def mesclar_shards(base_dir: Path, n: int | None) -> int:
+    """
+    Combina os resultados dos N shards gravados na mesma árvore (pastas
+    shard_*_de_N; execuções com outro N são ignoradas):
+    - valida os manifestos (todos os shards, sem cenário repetido);
+    - mescla os acumuladores parciais do envelope (etapa 7);
+    - junta manifestos e relatórios em shards/manifest.json e
+      shards/relatorio_execucao.json;
+    - concatena os resumos de deltaTempo (etapa 4).
+    Retorna != 0 (sem gerar nada) se algum shard falhou, não tem relatório
+    ou não tem os resultados parciais.
+    """
+    pasta = base_dir / PASTA_SHARDS
+    if n is None:
+        disponiveis = n_shards_disponiveis(pasta)
+        if len(disponiveis) != 1:
+            print(f"❌ Informe N em --merge N (encontrados em {pasta}: {disponiveis or 'nenhum'})")
+            return 1
+        n = disponiveis[0]
+    manifestos = [
+        json.loads(p.read_text(encoding="utf-8"))
+        for p in sorted(pasta.glob(f"shard_*_de_{n}/manifest.json"))
+    ]
+    if not manifestos:
+        print(f"❌ Nenhum manifesto de shard_*_de_{n} encontrado em {pasta}")
+        return 1
+    faltando = sorted(set(range(1, n + 1)) - {m["shard"] for m in manifestos})
+    if faltando:
+        print(f"❌ Shards sem manifesto: {faltando} (de {n})")
+        return 1
+
+    cenarios: list[str] = []
+    for m in manifestos:
+        cenarios += m["cenarios"]
+    repetidos = sorted(c for c, k in Counter(cenarios).items() if k > 1)
+    if repetidos:
+        print(f"❌ Cenários em mais de um shard: {repetidos}")
+        return 1
+    nao_cobertos = sorted({nome_cenario(a) for a in listar_cenarios(base_dir)} - set(cenarios))
+    if nao_cobertos:
+        print(f"⚠️ Cenários de data_raw/ fora de todos os manifestos: {nao_cobertos}")
+
+    relatorios = []
+    sem_relatorio = []
+    for m in sorted(manifestos, key=lambda m: m["shard"]):
+        rel = pasta / rotulo_shard(m["shard"], n) / "relatorio_execucao.json"
+        if not rel.exists():
+            sem_relatorio.append(m["shard"])
+            continue
+        relatorios.append(json.loads(rel.read_text(encoding="utf-8")))
+    if sem_relatorio:
+        print(f"❌ Shards sem relatório de execução (ainda rodando?): {sem_relatorio}")
+        return 1
+    com_erro = [r["shard"] for r in relatorios if not r["sucesso"]]
+    if com_erro:
+        print(f"❌ Shards com erro em alguma etapa: {com_erro} (rode-os novamente antes do merge)")
+        return 1
+    pasta_vis = base_dir / "data_visualization"
+    resumos = [pasta_vis / f"resumo_deltaTempo__{rotulo_shard(i, n)}.csv" for i in range(1, n + 1)]
+    ausentes = [p.name for p in resumos if not p.exists()]
+    if ausentes:
+        print(f"❌ Resumos de deltaTempo ausentes: {ausentes}")
+        return 1
+
+    # Envelope (etapa 7): confere e mescla os parciais antes de gravar o resto
+    resumo_dt = pd.concat([pd.read_csv(p) for p in resumos], ignore_index=True)
+    code = run_script(
+        base_dir / "7-envelope_statistics.py",
+        extra_args=["--mesclar-parciais", "--n-shards", str(n)],
+    )
+    if code != 0:
+        print("❌ Falha ao mesclar o envelope; nada mais foi gravado.")
+        return code
+
+    salvar_json(pasta / "manifest.json", {
+        "n_shards": n,
+        "hash": "crc32(nome_base) % N + 1",
+        "cenarios": sorted(cenarios),
+        "cenarios_por_shard": {m["shard"]: len(m["cenarios"]) for m in manifestos},
+    })
+    salvar_json(pasta / "relatorio_execucao.json", {"n_shards": n, "shards": relatorios})
+    print(f"📝 Manifesto e relatório combinados em {pasta}")
+
+    # Resumo de deltaTempo (etapa 4)
+    destino = pasta_vis / "resumo_deltaTempo.csv"
+    resumo_dt.sort_values("arquivo").to_csv(destino, index=False)
+    print(f"📝 {len(resumos)} resumo(s) de deltaTempo → {destino}")
+    return 0
+
 def main():
     parser = argparse.ArgumentParser(
         description="Roda a pipeline completa na ordem definida.",
@@ -54,10 +190,23 @@ def main():
         "--base-dir", type=str, default=".",
         help="Diretório onde estão os scripts."
     )
+    parser.add_argument(
+        "--shard", type=tipo_shard, default=None, metavar="i/N",
+        help="Processa apenas o shard i de N (cenários por hash estável do nome)."
+    )
+    parser.add_argument(
+        "--merge", type=int, nargs="?", const=0, default=None, metavar="N",
+        help="Combina os resultados dos N shards já executados (não roda a pipeline); "
+             "sem N, usa o único N presente em shards/."
+    )
     args = parser.parse_args()
 
     base_dir = Path(args.base_dir).resolve()
     print(f"📂 Base dir: {base_dir}")
+
+    if args.merge is not None:
+        return mesclar_shards(base_dir, args.merge or None)
+
     print(f"⏱️  Delay entre etapas: {args.delay}s")
     print(f"⛔ Stop on error: {'SIM' if args.stop_on_error else 'NÃO'}")
 
@@ -70,18 +219,57 @@ def main():
             return 1
         paths.append(p)
 
+    env = None
+    pasta_shard = None
+    relatorio = None
+    if args.shard is not None:
+        i, n = args.shard
+        env = dict(os.environ, **{VAR_AMBIENTE_SHARD: f"{i}/{n}"})
+        pasta_shard = base_dir / PASTA_SHARDS / rotulo_shard(i, n)
+        cenarios = [nome_cenario(a) for a in listar_cenarios(base_dir) if shard_do_cenario(a, n) == i]
+        salvar_json(pasta_shard / "manifest.json", {
+            "shard": i,
+            "n_shards": n,
+            "hash": "crc32(nome_base) % N + 1",
+            "cenarios": cenarios,
+        })
+        relatorio = {
+            "shard": i,
+            "n_shards": n,
+            "host": platform.node(),
+            "inicio": datetime.now().isoformat(timespec="seconds"),
+            "etapas": [],
+        }
+        print(f"🧩 Shard {i}/{n}: {len(cenarios)} cenário(s)")
+
     overall_ok = True
+    code = 0
     for i, spath in enumerate(paths, start=1):
-        code = run_script(spath)
+        t0 = time.perf_counter()
+        code = run_script(spath, env=env)
+        if relatorio is not None:
+            relatorio["etapas"].append({
+                "script": spath.name,
+                "exit_code": code,
+                "duracao_s": round(time.perf_counter() - t0, 3),
+            })
         if code != 0:
             overall_ok = False
             print(f"❗ Script {spath.name} retornou código {code}.")
             if args.stop_on_error:
                 print("🚫 Encerrando a pipeline por conta de erro.")
-                return code
+                break
         if i < len(paths):
             time.sleep(args.delay)
 
+    if relatorio is not None:
+        relatorio["fim"] = datetime.now().isoformat(timespec="seconds")
+        relatorio["sucesso"] = overall_ok
+        salvar_json(pasta_shard / "relatorio_execucao.json", relatorio)
+        print(f"📝 Manifesto e relatório do shard em {pasta_shard}")
+
+    if not overall_ok and args.stop_on_error:
+        return code
     if overall_ok:
         print("\n✅ Pipeline concluída com sucesso!")
         return 0
@@ -23,6 +23,8 @@
 import os
 import pandas as pd
 
+from sips_utils import pertence_ao_shard
+
 
 def load_mapping(
     excel_path: str,
@@ -113,7 +115,7 @@ def main() -> None:
 
     os.makedirs(out_dir, exist_ok=True)
     for fname in sorted(os.listdir(in_dir)):
-        if not fname.lower().endswith('.plt'):
+        if not fname.lower().endswith('.plt') or not pertence_ao_shard(fname):
             continue
         src = os.path.join(in_dir, fname)
         dst = os.path.join(out_dir, fname)
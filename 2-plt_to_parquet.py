@@ -11,16 +11,33 @@
 #   3) Coleta os dados brutos, separa por espaços e concatena valores.
 #   4) Verifica múltiplo de n_vars e faz reshape(-1, n_vars).
 #   5) Gera DataFrame com nomes de variáveis, garantindo unicidade.
-#   6) Salva em Parquet.
+#   6) Poda colunas mortas/constantes (placeholders "Error", só NaN,
+#      valor constante) e gera relatório por arquivo.
+#   7) Salva em Parquet (constantes ficam nos metadados do arquivo).
+#   8) Gera a pirâmide mín./máx. (2×, 4×, ...) usada nos gráficos.
 #
-# Entrada:  data_renamed/    (arquivos .plt)
-# Saída:    data_parquet/    (arquivos .parquet)
+# Entrada:  data_renamed/           (arquivos .plt)
+# Saída:    data_parquet/           (arquivos .parquet)
+#           data_parquet_piramide/  (pirâmide mín./máx. por arquivo)
+#           relatorio_poda/         (um .csv por arquivo com as colunas podadas)
 # ================================================================
 
 import os
+import re
 import pandas as pd
 import numpy as np
 
+from sips_utils import pertence_ao_shard, remover_piramide, salvar_parquet, salvar_piramide
+
+# ---------------------- Configuração ----------------------------
+PODAR_COLUNAS = True            # False para manter todas as colunas
+MODO_PODA = "metadados"         # "metadados": guarda constantes como escalar
+                                # nos metadados do Parquet; "remover": só descarta
+NOMES_PLACEHOLDER = ["Error"]   # nomes (e variantes _1, _2, ...) sempre descartados
+GERAR_PIRAMIDE = True           # pirâmide mín./máx. para gráficos rápidos
+MIN_BALDES_PIRAMIDE = 32        # nível mais grosso tem ao menos esse nº de baldes
+# ----------------------------------------------------------------
+
 
 def tornar_colunas_unicas(colunas: list[str]) -> list[str]:
     """Caso existam duplicatas, adiciona sufixos _1, _2, ..."""
@@ -83,16 +100,73 @@ def ler_plt_como_tabela(caminho_arquivo: str) -> pd.DataFrame:
     return df
 
 
+def eh_placeholder(coluna: str) -> bool:
+    """True para nomes como 'Error', 'Error_1', ... (ver NOMES_PLACEHOLDER)."""
+    return any(
+        coluna == p or re.fullmatch(rf"{re.escape(p)}_\d+", coluna)
+        for p in NOMES_PLACEHOLDER
+    )
+
+
+def podar_colunas(df: pd.DataFrame) -> tuple[pd.DataFrame, dict[str, float], pd.DataFrame]:
+    """
+    Varre todas as colunas de uma vez (vetorizado) e remove:
+    - placeholders (NOMES_PLACEHOLDER);
+    - colunas só com NaN;
+    - colunas com valor constante durante toda a simulação.
+    A 1ª coluna (tempo) nunca é podada.
+    Retorna (df_podado, constantes {coluna: valor}, relatorio).
+    """
+    arr = df.to_numpy(dtype=float)
+    if arr.shape[0] == 0:
+        # Só cabeçalho, sem amostras: não há como decidir, nada é podado
+        return df, {}, pd.DataFrame(columns=["coluna", "motivo", "valor"])
+    nan = np.isnan(arr)
+    so_nan = nan.all(axis=0)
+    constante = ~nan.any(axis=0) & (arr == arr[0]).all(axis=0)
+
+    linhas = []
+    for j, col in enumerate(df.columns):
+        if j == 0:
+            continue
+        if eh_placeholder(col):
+            motivo = "placeholder"
+        elif so_nan[j]:
+            motivo = "so_nan"
+        elif constante[j]:
+            motivo = "constante"
+        else:
+            continue
+        valor = float(arr[0, j]) if constante[j] else np.nan
+        linhas.append({"coluna": col, "motivo": motivo, "valor": valor})
+
+    relatorio = pd.DataFrame(linhas, columns=["coluna", "motivo", "valor"])
+    constantes: dict[str, float] = {}
+    if MODO_PODA == "metadados":
+        constantes = {
+            r["coluna"]: r["valor"] for r in linhas if r["motivo"] == "constante"
+        }
+    df_podado = df.drop(columns=relatorio["coluna"].tolist())
+    return df_podado, constantes, relatorio
+
+
 def main() -> None:
     base = os.path.dirname(os.path.abspath(__file__))
     pasta_in = os.path.join(base, 'data_renamed')   # <- entrada
     pasta_out = os.path.join(base, 'data_parquet')   # <- saída
+    pasta_rel = os.path.join(base, 'relatorio_poda')
+    pasta_pir = os.path.join(base, 'data_parquet_piramide')
     os.makedirs(pasta_out, exist_ok=True)
+    if GERAR_PIRAMIDE:
+        os.makedirs(pasta_pir, exist_ok=True)
+    if PODAR_COLUNAS:
+        os.makedirs(pasta_rel, exist_ok=True)
 
     if not os.path.isdir(pasta_in):
         raise FileNotFoundError(f"Pasta de entrada não encontrada: {pasta_in}")
 
-    arquivos = [f for f in os.listdir(pasta_in) if f.lower().endswith('.plt')]
+    arquivos = [f for f in os.listdir(pasta_in)
+                if f.lower().endswith('.plt') and pertence_ao_shard(f)]
     print(f"🔍 {len(arquivos)} arquivos .plt em {pasta_in}")
 
     for arq in sorted(arquivos):
@@ -101,9 +175,24 @@ def main() -> None:
         print(f"📄 Processando {arq}...")
         try:
             df = ler_plt_como_tabela(src)
-            # Você pode adicionar compression='snappy' se desejar compactar:
-            df.to_parquet(dst, index=False)
+            constantes: dict[str, float] = {}
+            if PODAR_COLUNAS:
+                n_antes = df.shape[1]
+                df, constantes, relatorio = podar_colunas(df)
+                rel = os.path.join(pasta_rel, os.path.splitext(arq)[0] + '.csv')
+                relatorio.to_csv(rel, index=False)
+                print(
+                    f"🧹 {n_antes - df.shape[1]} de {n_antes} colunas podadas "
+                    f"({', '.join(f'{m}={n}' for m, n in relatorio['motivo'].value_counts().items()) or 'nenhuma'})"
+                )
+            salvar_parquet(df, dst, constantes)
             print(f"✅ {arq} → {dst}")
+            dst_pir = os.path.join(pasta_pir, os.path.basename(dst))
+            if GERAR_PIRAMIDE:
+                # 1ª coluna é sempre o tempo (formato .PLT)
+                salvar_piramide(df, df.columns[0], dst_pir, MIN_BALDES_PIRAMIDE)
+            else:
+                remover_piramide(dst_pir)
         except Exception as e:
             print(f"⚠️ Erro em {arq}: {e}")
 
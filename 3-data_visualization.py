@@ -5,6 +5,9 @@
 #   Lê .parquet(s) de data_parquet/, detecta a coluna de tempo e
 #   plota variáveis por prefixo, salvando em data_visualization/.
 #   Inclui verificações e logs para diagnosticar erros de leitura.
+#   Quando existe a pirâmide mín./máx. (data_parquet_piramide/, gerada
+#   por 2-plt_to_parquet.py), lê só o nível suficiente para a largura
+#   da figura; caso contrário usa as amostras exatas.
 # ================================================================
 
 import os
@@ -12,6 +15,8 @@ import glob
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from sips_utils import carregar_para_plot, pertence_ao_shard
+
 # ---------- Configuração ----------
 SOMENTE_UM_ARQUIVO = False  # True para processar só UM arquivo específico
 NOME_ARQUIVO_UNICO = "PCC_1500_PO1_DIR1_1_EVT_1.parquet"  # usado se SOMENTE_UM_ARQUIVO=True
@@ -19,15 +24,20 @@ NOME_ARQUIVO_UNICO = "PCC_1500_PO1_DIR1_1_EVT_1.parquet"  # usado se SOMENTE_UM_
 PREFIXOS = [
     "Rang", "Vpu", "Vang", "Idpu", "Pmpu", "Prpu", "Freqpu", "dFreqpus", "FN"
 ]
+
+JANELA_TEMPO = None         # (t_ini, t_fim) em s para zoom; None = série inteira
+LARGURA_PX = 12 * 150       # largura da figura (pol.) × dpi
 # ----------------------------------
 
 base = os.path.dirname(os.path.abspath(__file__))
 pasta_in = os.path.join(base, "data_parquet")
+pasta_pir = os.path.join(base, "data_parquet_piramide")
 pasta_out = os.path.join(base, "data_visualization")
 os.makedirs(pasta_out, exist_ok=True)
 
 def listar_parquets(pasta: str) -> list[str]:
-    return sorted(glob.glob(os.path.join(pasta, "*.parquet")))
+    caminhos = glob.glob(os.path.join(pasta, "*.parquet"))
+    return sorted(p for p in caminhos if pertence_ao_shard(p))
 
 def detectar_coluna_tempo(df: pd.DataFrame) -> str | None:
     return next((c for c in df.columns if "tempo" in c.lower()), None)
@@ -48,7 +58,7 @@ def processar_parquet(caminho_parquet: str) -> None:
 
     try:
         # engine="pyarrow" é o padrão recomendado
-        df = pd.read_parquet(caminho_parquet, engine="pyarrow")
+        df, exato = carregar_para_plot(caminho_parquet, pasta_pir, JANELA_TEMPO, LARGURA_PX)
     except Exception as e:
         print("❌ Falha ao ler Parquet.")
         print(f"   Tipo: {type(e).__name__}")
@@ -65,6 +75,8 @@ def processar_parquet(caminho_parquet: str) -> None:
         print(f"   Colunas disponíveis: {list(df.columns)[:15]}{'...' if len(df.columns)>15 else ''}")
         return
 
+    if not exato:
+        print(f"   🔺 Usando pirâmide mín./máx. ({len(df) // 2} baldes)")
     tempo = df[col_tempo]
     grupos = grupos_por_prefixo(list(df.columns))
 
@@ -77,6 +89,8 @@ def processar_parquet(caminho_parquet: str) -> None:
                 plt.plot(tempo, df[coluna], label=coluna)
             except Exception as e:
                 print(f"   ⚠️ Erro ao plotar coluna '{coluna}': {e}")
+        if JANELA_TEMPO is not None:
+            plt.xlim(*JANELA_TEMPO)
         plt.xlabel("Tempo (s)")
         plt.ylabel("Valor")
         plt.title(f"{nome_base} — grupo {nome_grupo}")
@@ -6,6 +6,8 @@
 #   Lê todos os .parquet em data_parquet/, detecta a coluna de tempo,
 #   calcula o deltaTempo entre amostras consecutivas e salva um
 #   gráfico em data_visualization/ para cada arquivo.
+#   Também salva um resumo (resumo_deltaTempo.csv) com as estatísticas
+#   de deltaTempo de todos os arquivos.
 # ================================================================
 
 import os
@@ -13,15 +15,26 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from sips_utils import pertence_ao_shard, rotulo_shard, shard_atual
+
 base = os.path.dirname(os.path.abspath(__file__))
 pasta_in = os.path.join(base, "data_parquet")
 pasta_out = os.path.join(base, "data_visualization")
 os.makedirs(pasta_out, exist_ok=True)
 
-arquivos = [f for f in os.listdir(pasta_in) if f.lower().endswith(".parquet")]
+shard = shard_atual()
+arquivos = [
+    f for f in os.listdir(pasta_in)
+    if f.lower().endswith(".parquet") and pertence_ao_shard(f)
+]
 if not arquivos:
-    raise FileNotFoundError(f"Nenhum arquivo .parquet encontrado em {pasta_in}")
+    if shard is None:
+        raise FileNotFoundError(f"Nenhum arquivo .parquet encontrado em {pasta_in}")
+    # Shard sem cenários (N maior que o nº de arquivos): nada a fazer,
+    # mas o resumo vazio é gravado para o merge.
+    print(f"ℹ️ Nenhum cenário para o shard {shard[0]}/{shard[1]}.")
 
+resumo = []
 for nome_arq in sorted(arquivos):
     caminho_parquet = os.path.join(pasta_in, nome_arq)
     print(f"📄 Processando {nome_arq}...")
@@ -49,6 +62,14 @@ for nome_arq in sorted(arquivos):
     # Estatísticas básicas
     media = float(np.mean(deltaTempo))
     print(f"   Média deltaTempo = {media:.9f} s ({1/media:.2f} Hz aprox.)")
+    resumo.append({
+        "arquivo": nome_arq,
+        "n_amostras": int(tempo.size),
+        "dt_medio": media,
+        "dt_min": float(np.min(deltaTempo)),
+        "dt_max": float(np.max(deltaTempo)),
+        "freq_media_hz": 1 / media,
+    })
 
     # Gera gráfico
     plt.figure(figsize=(10, 4))
@@ -66,4 +87,11 @@ for nome_arq in sorted(arquivos):
     plt.close()
     print(f"   ✅ Gráfico salvo em {png_out}")
 
+# Resumo (em modo shard, um arquivo por shard; ver 0-run_pipeline.py --merge)
+sufixo = f"__{rotulo_shard(*shard)}" if shard else ""
+csv_out = os.path.join(pasta_out, f"resumo_deltaTempo{sufixo}.csv")
+colunas_resumo = ["arquivo", "n_amostras", "dt_medio", "dt_min", "dt_max", "freq_media_hz"]
+pd.DataFrame(resumo, columns=colunas_resumo).to_csv(csv_out, index=False)
+print(f"📝 Resumo salvo em {csv_out}")
+
 print("\n🏁 Concluído. Gráficos disponíveis em data_visualization/")
@@ -7,18 +7,28 @@
 #
 # Entrada:  data_parquet/        (arquivos .parquet originais)
 # Saída:    data_parquet_120Hz/  (reamostrados a 120 Hz)
+#           data_parquet_120Hz_piramide/  (pirâmide mín./máx. para gráficos)
 # ================================================================
 
 import os
 import numpy as np
 import pandas as pd
 
+from sips_utils import (
+    ler_constantes, pertence_ao_shard, remover_piramide, salvar_parquet, salvar_piramide,
+)
+
 # ------------------------ Configuração --------------------------
 PASTA_IN  = "data_parquet"
 PASTA_OUT = "data_parquet_120Hz"
 F_HZ      = 120.0
 DT        = 1.0 / F_HZ           # ≈ 0.0083333333 s
+GERAR_PIRAMIDE = True          # pirâmide mín./máx. para gráficos rápidos
+PASTA_PIRAMIDE = "data_parquet_120Hz_piramide"
+MIN_BALDES_PIRAMIDE = 32
 os.makedirs(PASTA_OUT, exist_ok=True)
+if GERAR_PIRAMIDE:
+    os.makedirs(PASTA_PIRAMIDE, exist_ok=True)
 # ---------------------------------------------------------------
 
 def gerar_grid(inicio: float, fim: float, passo: float) -> np.ndarray:
@@ -76,8 +86,13 @@ def processar_arquivo(caminho_in: str, caminho_out: str) -> None:
     # (mantemos apenas as numéricas interpoladas + coluna de tempo)
     df_final = base_interp
 
-    # Salva
-    df_final.to_parquet(caminho_out, index=False)
+    # Salva (repassa as colunas constantes podadas na conversão, se houver)
+    salvar_parquet(df_final, caminho_out, ler_constantes(caminho_in))
+    dst_pir = os.path.join(PASTA_PIRAMIDE, os.path.basename(caminho_out))
+    if GERAR_PIRAMIDE:
+        salvar_piramide(df_final, col_t, dst_pir, MIN_BALDES_PIRAMIDE)
+    else:
+        remover_piramide(dst_pir)
     print(
         f"✅ {os.path.basename(caminho_in):<38} | "
         f"orig: {len(df):5d} → final(120Hz): {len(df_final):5d}"
@@ -89,7 +104,7 @@ def main():
         print(f"⚠️  Nenhum arquivo .parquet encontrado em {PASTA_IN}")
         return
 
-    for nome in sorted(arquivos):
+    for nome in sorted(filter(pertence_ao_shard, arquivos)):
         src = os.path.join(PASTA_IN, nome)
         dst = os.path.join(PASTA_OUT, nome)
         try:
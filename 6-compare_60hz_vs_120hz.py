@@ -9,12 +9,18 @@
 #   data_parquet_120Hz/, gera uma figura com 2 subplots:
 #     (1) visão geral; (2) zoom em 0.15–0.45 s e limite superior de Y.
 #   Figuras são salvas em data_visualization/.
+#   Cada painel lê só o necessário: o nível mais grosso da pirâmide
+#   mín./máx. (pastas *_piramide/) que ainda resolve a janela na largura
+#   da figura, ou as amostras exatas (ex.: no zoom).
 # ================================================================
 
 import os
 import pandas as pd
+import pyarrow.parquet as pq
 import matplotlib.pyplot as plt
 
+from sips_utils import carregar_para_plot, ler_constantes, pertence_ao_shard, shard_atual
+
 # ---------------------- Configuração ----------------------------
 GRANDEZA = "Vang_XES"          # nome da coluna a comparar
 PASTA_ORIG = "data_parquet"
@@ -23,12 +29,15 @@ PASTA_OUT  = "60hz_vs_120hz"
 
 X_ZOOM = (0.15, 0.45)          # janela de zoom (s)
 Y_MAX_ZOOM = 140               # limite superior do zoom (None para auto)
+LARGURA_PX = 14 * 150          # largura da figura (pol.) × dpi
 # ----------------------------------------------------------------
 
 base = os.path.dirname(os.path.abspath(__file__))
 pasta_original = os.path.join(base, PASTA_ORIG)
 pasta_120hz    = os.path.join(base, PASTA_120)
 outdir         = os.path.join(base, PASTA_OUT)
+pasta_original_pir = os.path.join(base, f"{PASTA_ORIG}_piramide")
+pasta_120hz_pir    = os.path.join(base, f"{PASTA_120}_piramide")
 os.makedirs(outdir, exist_ok=True)
 
 if not os.path.isdir(pasta_original):
@@ -40,49 +49,81 @@ if not os.path.isdir(pasta_120hz):
 orig_set = {os.path.splitext(f)[0] for f in os.listdir(pasta_original) if f.lower().endswith(".parquet")}
 hz_set   = {os.path.splitext(f)[0] for f in os.listdir(pasta_120hz)   if f.lower().endswith(".parquet")}
 
-# Pares com o mesmo nome base
-bases_em_comum = sorted(orig_set & hz_set)
+# Pares com o mesmo nome base (apenas os do shard atual, se houver)
+shard = shard_atual()
+bases_em_comum = sorted(b for b in orig_set & hz_set if pertence_ao_shard(f"{b}.parquet"))
 if not bases_em_comum:
-    raise FileNotFoundError("Nenhum par <nome>.parquet encontrado simultaneamente em data_parquet/ e data_parquet_120Hz/.")
-
-def detectar_coluna_tempo(df: pd.DataFrame) -> str | None:
-    return next((c for c in df.columns if "tempo" in c.lower()), None)
+    if shard is None:
+        raise FileNotFoundError("Nenhum par <nome>.parquet encontrado simultaneamente em data_parquet/ e data_parquet_120Hz/.")
+    # Shard sem cenários: nada a comparar
+    print(f"ℹ️ Nenhum cenário para o shard {shard[0]}/{shard[1]}.")
+
+def detectar_coluna_tempo(colunas: list[str]) -> str | None:
+    return next((c for c in colunas if "tempo" in c.lower()), None)
+
+def carregar_grandeza(caminho: str, pasta_piramide: str, janela: tuple[float, float] | None,
+                      col_t: str, constantes: dict[str, float]) -> tuple[pd.DataFrame, bool]:
+    """Carrega tempo + GRANDEZA; se ela foi podada como constante, reconstrói a coluna."""
+    if GRANDEZA in constantes:
+        df, exato = carregar_para_plot(caminho, pasta_piramide, janela, LARGURA_PX, [col_t])
+        df[GRANDEZA] = constantes[GRANDEZA]
+        return df, exato
+    return carregar_para_plot(caminho, pasta_piramide, janela, LARGURA_PX, [col_t, GRANDEZA])
 
 for nome_base in bases_em_comum:
     caminho_original = os.path.join(pasta_original, f"{nome_base}.parquet")
     caminho_interp   = os.path.join(pasta_120hz,   f"{nome_base}.parquet")
 
     try:
-        df_original = pd.read_parquet(caminho_original, engine="pyarrow")
-        df_interp   = pd.read_parquet(caminho_interp,   engine="pyarrow")
+        colunas_original = pq.read_schema(caminho_original).names
+        colunas_interp   = pq.read_schema(caminho_interp).names
+        constantes_original = ler_constantes(caminho_original)
+        constantes_interp   = ler_constantes(caminho_interp)
     except Exception as e:
         print(f"❌ Erro lendo '{nome_base}': {e}")
         continue
 
-    col_tempo_original = detectar_coluna_tempo(df_original)
-    col_tempo_interp   = detectar_coluna_tempo(df_interp)
+    col_tempo_original = detectar_coluna_tempo(colunas_original)
+    col_tempo_interp   = detectar_coluna_tempo(colunas_interp)
 
     if col_tempo_original is None or col_tempo_interp is None:
         print(f"⚠️ Coluna de tempo ausente em '{nome_base}'. Pulando.")
         continue
 
-    if GRANDEZA not in df_original.columns or GRANDEZA not in df_interp.columns:
+    if (GRANDEZA not in colunas_original and GRANDEZA not in constantes_original) or \
+       (GRANDEZA not in colunas_interp and GRANDEZA not in constantes_interp):
         print(f"⚠️ Grandeza '{GRANDEZA}' não encontrada em ambos para '{nome_base}'. Pulando.")
         continue
 
+    # Dados por painel: visão geral (série inteira) e zoom (X_ZOOM)
+    try:
+        paineis = [
+            (
+                carregar_grandeza(caminho_original, pasta_original_pir, janela,
+                                  col_tempo_original, constantes_original),
+                carregar_grandeza(caminho_interp, pasta_120hz_pir, janela,
+                                  col_tempo_interp, constantes_interp),
+            )
+            for janela in (None, X_ZOOM)
+        ]
+    except Exception as e:
+        print(f"❌ Erro lendo '{nome_base}': {e}")
+        continue
+    (df_original, exato_original), (df_interp, exato_interp) = paineis[0]
+
     # Figura com dois subplots independentes
     fig, axs = plt.subplots(2, 1, figsize=(14, 8))
 
-    # Plot 1: visão geral
+    # Plot 1: visão geral (marcadores só quando são amostras exatas)
     axs[0].plot(
         df_original[col_tempo_original], df_original[GRANDEZA],
         label="Original",
-        color="#666666", marker='o', linestyle='-', markersize=6, markerfacecolor='none'
+        color="#666666", marker='o' if exato_original else None, linestyle='-', markersize=6, markerfacecolor='none'
     )
     axs[0].plot(
         df_interp[col_tempo_interp], df_interp[GRANDEZA],
         label="Interpolado/Reamostrado (120 Hz)",
-        color="#e57373", marker='^', linestyle='--', markersize=6, markerfacecolor='none'
+        color="#e57373", marker='^' if exato_interp else None, linestyle='--', markersize=6, markerfacecolor='none'
     )
     axs[0].set_title(f"{nome_base} — Simulação vs. Interpolado/Reamostrado (120 Hz)")
     axs[0].set_xlabel("Tempo (s)")
@@ -91,15 +132,16 @@ for nome_base in bases_em_comum:
     axs[0].legend()
 
     # Plot 2: zoom
+    (df_original, exato_original), (df_interp, exato_interp) = paineis[1]
     axs[1].plot(
         df_original[col_tempo_original], df_original[GRANDEZA],
         label="Original",
-        color="#666666", marker='o', linestyle='-', markersize=6, markerfacecolor='none'
+        color="#666666", marker='o' if exato_original else None, linestyle='-', markersize=6, markerfacecolor='none'
     )
     axs[1].plot(
         df_interp[col_tempo_interp], df_interp[GRANDEZA],
         label="Interpolado/Reamostrado (120 Hz)",
-        color="#e57373", marker='^', linestyle='--', markersize=6, markerfacecolor='none'
+        color="#e57373", marker='^' if exato_interp else None, linestyle='--', markersize=6, markerfacecolor='none'
     )
     axs[1].set_xlim(*X_ZOOM)
     if Y_MAX_ZOOM is not None:
@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+# ================================================================
+# Script: 7-envelope_statistics.py
+# Autor: Bryan Ambrósio
+# Descrição:
+#   Calcula, para cada variável selecionada, o envelope entre todos os
+#   cenários no grid comum de 120 Hz: mínimo, máximo, média, desvio
+#   padrão e faixas de percentis (P5/P50/P95).
+#
+#   Os arquivos de data_parquet_120Hz/ são lidos UMA única vez, um por
+#   vez, e apenas as colunas selecionadas. A memória fica limitada ao
+#   tamanho do grid, independente do número de cenários:
+#     - média/variância: algoritmo online de Welford (mesclável via Chan);
+#     - mín./máx.: acumulados diretamente;
+#     - percentis: sketch KLL simplificado por ponto do grid
+#       (exato enquanto o número de cenários ≤ CAPACIDADE_SKETCH).
+#
+#   Com N_PROCESSOS > 1 os arquivos são divididos entre processos e os
+#   acumuladores parciais são mesclados ao final. Em modo shard
+#   (SIPS_SHARD, ver 0-run_pipeline.py) cada shard salva seu acumulador
+#   em data_envelope/parciais/ e `--mesclar-parciais` gera o envelope.
+#
+# Entrada:  data_parquet_120Hz/   (arquivos .parquet reamostrados)
+# Saída:    data_envelope/envelope_120Hz.parquet
+#           data_envelope/envelope__<variavel>.png
+# ================================================================
+
+import os
+import glob
+import fnmatch
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import matplotlib.pyplot as plt
+
+from sips_utils import ler_constantes, pertence_ao_shard, rotulo_shard, shard_atual
+
+# ---------------------- Configuração ----------------------------
+PASTA_IN  = "data_parquet_120Hz"
+PASTA_OUT = "data_envelope"
+ARQUIVO_ENVELOPE = "envelope_120Hz.parquet"
+
+# Variáveis a agregar (aceita curingas no estilo fnmatch)
+VARIAVEIS = ["Vang_XES", "Freqpu_*"]
+
+F_HZ   = 120.0
+DT     = 1.0 / F_HZ            # passo do grid comum (s)
+T_ORIGEM = 0.0                 # instante correspondente ao índice 0 do grid
+
+PERCENTIS = [5, 50, 95]
+CAPACIDADE_SKETCH = 64         # itens por nível do sketch (maior = mais preciso)
+N_PROCESSOS = 1                # > 1 para dividir os arquivos entre processos
+# ----------------------------------------------------------------
+
+base = os.path.dirname(os.path.abspath(__file__))
+pasta_in  = os.path.join(base, PASTA_IN)
+pasta_out = os.path.join(base, PASTA_OUT)
+pasta_parciais = os.path.join(pasta_out, "parciais")
+
+
+def detectar_coluna_tempo(colunas: list[str]) -> str | None:
+    return next((c for c in colunas if "tempo" in c.lower()), None)
+
+
+def selecionar_variaveis(colunas: list[str]) -> list[str]:
+    """Filtra as colunas que casam com algum padrão de VARIAVEIS, preservando a ordem."""
+    return [c for c in colunas if any(fnmatch.fnmatchcase(c, p) for p in VARIAVEIS)]
+
+
+# ------------------------ Acumulador -----------------------------
+# Dicionário de arrays com shape (n_grid, n_vars[, n_itens]):
+#   n, media, m2, minimo, maximo -> estatísticas online
+#   niveis[h]                   -> itens do nível h do sketch (peso 2**h)
+#   contagem[h]                 -> nº de itens válidos do nível h por ponto
+#   paridade[h]                 -> alterna o deslocamento da compactação
+# Em cada ponto do grid os itens válidos ocupam as primeiras contagem[h]
+# posições do nível e o resto é NaN: pontos que um cenário não alcança
+# não ocupam o sketch, e cada ponto é compactado quando os SEUS itens
+# enchem o nível.
+
+def novo_acumulador(variaveis: list[str], n_grid: int = 0) -> dict:
+    n_vars = len(variaveis)
+    return {
+        "variaveis": list(variaveis),
+        "n":      np.zeros((n_grid, n_vars), dtype=np.int64),
+        "media":  np.zeros((n_grid, n_vars), dtype=float),
+        "m2":     np.zeros((n_grid, n_vars), dtype=float),
+        "minimo": np.full((n_grid, n_vars), np.inf),
+        "maximo": np.full((n_grid, n_vars), -np.inf),
+        "niveis": [],
+        "contagem": [],
+        "paridade": [],
+    }
+
+
+def expandir_grid(acc: dict, n_grid: int) -> None:
+    """Aumenta o grid do acumulador (cenário mais longo que os anteriores)."""
+    extra = n_grid - acc["n"].shape[0]
+    if extra <= 0:
+        return
+
+    def _pad(arr: np.ndarray, valor: float) -> np.ndarray:
+        bloco = np.full((extra,) + arr.shape[1:], valor, dtype=arr.dtype)
+        return np.concatenate([arr, bloco], axis=0)
+
+    acc["n"]      = _pad(acc["n"], 0)
+    acc["media"]  = _pad(acc["media"], 0.0)
+    acc["m2"]     = _pad(acc["m2"], 0.0)
+    acc["minimo"] = _pad(acc["minimo"], np.inf)
+    acc["maximo"] = _pad(acc["maximo"], -np.inf)
+    # Pontos novos começam sem itens no sketch
+    acc["niveis"] = [_pad(nv, np.nan) for nv in acc["niveis"]]
+    acc["contagem"] = [_pad(c, 0) for c in acc["contagem"]]
+
+
+def alinhar_variaveis(acc: dict, variaveis: list[str]) -> None:
+    """Reordena/expande o eixo de variáveis (novas variáveis entram vazias)."""
+    if acc["variaveis"] == variaveis:
+        return
+    n_grid = acc["n"].shape[0]
+    novo = novo_acumulador(variaveis, n_grid)
+    pos = [variaveis.index(v) for v in acc["variaveis"]]
+    for chave in ("n", "media", "m2", "minimo", "maximo"):
+        novo[chave][:, pos] = acc[chave]
+    for nivel, cont in zip(acc["niveis"], acc["contagem"]):
+        nv = np.full((n_grid, len(variaveis), nivel.shape[2]), np.nan)
+        nv[:, pos] = nivel
+        novo["niveis"].append(nv)
+        c = np.zeros((n_grid, len(variaveis)), dtype=np.int64)
+        c[:, pos] = cont
+        novo["contagem"].append(c)
+    novo["paridade"] = list(acc["paridade"])
+    acc.update(novo)
+
+
+def _novo_nivel(acc: dict) -> None:
+    n_grid, n_vars = acc["n"].shape
+    acc["niveis"].append(np.full((n_grid, n_vars, CAPACIDADE_SKETCH), np.nan))
+    acc["contagem"].append(np.zeros((n_grid, n_vars), dtype=np.int64))
+    acc["paridade"].append(0)
+
+
+def _anexar(acc: dict, h: int, pontos: tuple[np.ndarray, np.ndarray],
+            novos: np.ndarray, n_novos: np.ndarray) -> None:
+    """
+    Anexa ao nível h, em cada ponto (grid, variável) de `pontos`, os
+    n_novos primeiros itens da linha correspondente de `novos` (k, m),
+    logo após os itens válidos que o ponto já tem.
+    """
+    cont = acc["contagem"][h][pontos]
+    largura = int((cont + n_novos).max(initial=0))
+    nivel = acc["niveis"][h]
+    if largura > nivel.shape[2]:
+        extra = np.full(nivel.shape[:2] + (largura - nivel.shape[2],), np.nan)
+        acc["niveis"][h] = nivel = np.concatenate([nivel, extra], axis=2)
+    k, j = np.nonzero(np.arange(novos.shape[1]) < n_novos[:, None])
+    nivel[pontos[0][k], pontos[1][k], cont[k] + j] = novos[k, j]
+    acc["contagem"][h][pontos] += n_novos
+
+
+def compactar(acc: dict) -> None:
+    """
+    Compacta os pontos do grid cujo nível do sketch encheu: ordena os itens
+    do ponto, mantém um a cada dois (deslocamento alternado) e os promove
+    para o nível seguinte, com o dobro do peso. Com nº ímpar de itens, o
+    último inserido fica no nível.
+    """
+    h = 0
+    while h < len(acc["niveis"]):
+        pontos = np.nonzero(acc["contagem"][h] >= CAPACIDADE_SKETCH)
+        if not pontos[0].size:
+            h += 1
+            continue
+        cont = acc["contagem"][h][pontos]
+        itens = acc["niveis"][h][pontos]                 # (k, largura)
+        par = cont - cont % 2
+        fora = np.arange(itens.shape[1]) >= par[:, None]
+        ordenado = np.sort(np.where(fora, np.nan, itens), axis=1)   # NaN vão para o fim
+        desloc = acc["paridade"][h]
+        acc["paridade"][h] ^= 1
+        promovidos = ordenado[:, desloc::2]
+
+        impar = cont % 2 == 1
+        resto = np.full_like(itens, np.nan)
+        resto[:, 0] = np.where(impar, itens[np.arange(cont.size), cont - 1], np.nan)
+        acc["niveis"][h][pontos] = resto
+        acc["contagem"][h][pontos] = impar
+
+        if h + 1 == len(acc["niveis"]):
+            _novo_nivel(acc)
+        _anexar(acc, h + 1, pontos, promovidos, par // 2)
+        h += 1
+
+
+def adicionar_cenario(acc: dict, idx: np.ndarray, valores: np.ndarray) -> None:
+    """
+    Acumula um cenário: idx (n_amostras,) são índices do grid e
+    valores (n_amostras, n_vars) os dados correspondentes.
+    """
+    n_grid = acc["n"].shape[0]
+    if idx.size and idx.max() + 1 > n_grid:
+        expandir_grid(acc, int(idx.max()) + 1)
+        n_grid = acc["n"].shape[0]
+
+    x = np.full((n_grid, len(acc["variaveis"])), np.nan)
+    x[idx] = valores
+    valido = ~np.isnan(x)
+
+    # Welford (apenas onde há dado válido)
+    acc["n"] += valido
+    n_seguro = np.maximum(acc["n"], 1)
+    delta = np.where(valido, x - acc["media"], 0.0)
+    acc["media"] += delta / n_seguro
+    acc["m2"] += np.where(valido, delta * (x - acc["media"]), 0.0)
+
+    acc["minimo"] = np.fmin(acc["minimo"], x)
+    acc["maximo"] = np.fmax(acc["maximo"], x)
+
+    # Sketch: cada cenário contribui com um item por ponto do grid alcançado
+    if not acc["niveis"]:
+        _novo_nivel(acc)
+    pontos = np.nonzero(valido)
+    _anexar(acc, 0, pontos, x[pontos][:, None], np.ones(pontos[0].size, dtype=np.int64))
+    compactar(acc)
+
+
+def mesclar(a: dict, b: dict) -> dict:
+    """Mescla dois acumuladores parciais em `a` (variáveis alinhadas pela união)."""
+    variaveis = a["variaveis"] + [v for v in b["variaveis"] if v not in a["variaveis"]]
+    alinhar_variaveis(a, variaveis)
+    alinhar_variaveis(b, variaveis)
+    n_grid = max(a["n"].shape[0], b["n"].shape[0])
+    expandir_grid(a, n_grid)
+    expandir_grid(b, n_grid)
+
+    # Chan et al.: combinação de médias e somas de quadrados
+    n = a["n"] + b["n"]
+    n_seguro = np.maximum(n, 1)
+    delta = b["media"] - a["media"]
+    a["media"] = a["media"] + delta * b["n"] / n_seguro
+    a["m2"] = a["m2"] + b["m2"] + delta ** 2 * a["n"] * b["n"] / n_seguro
+    a["n"] = n
+    a["minimo"] = np.fmin(a["minimo"], b["minimo"])
+    a["maximo"] = np.fmax(a["maximo"], b["maximo"])
+
+    for h, (nivel, cont) in enumerate(zip(b["niveis"], b["contagem"])):
+        if h == len(a["niveis"]):
+            _novo_nivel(a)
+        pontos = np.nonzero(cont)
+        _anexar(a, h, pontos, nivel[pontos], cont[pontos])
+    compactar(a)
+    return a
+
+
+def salvar_acumulador(acc: dict, caminho: str) -> None:
+    """Salva o acumulador em .npz (para mesclar depois, ex.: entre shards)."""
+    arrays = {k: acc[k] for k in ("n", "media", "m2", "minimo", "maximo")}
+    arrays["variaveis"] = np.array(acc["variaveis"])
+    arrays["paridade"] = np.array(acc["paridade"], dtype=np.int64)
+    for h, (nivel, cont) in enumerate(zip(acc["niveis"], acc["contagem"])):
+        arrays[f"nivel_{h}"] = nivel[:, :, :cont.max(initial=0)]   # sem as colunas só de NaN
+    np.savez(caminho, **arrays)
+
+
+def carregar_acumulador(caminho: str) -> dict:
+    with np.load(caminho) as z:
+        acc = {k: z[k] for k in ("n", "media", "m2", "minimo", "maximo")}
+        acc["variaveis"] = [str(v) for v in z["variaveis"]]
+        acc["paridade"] = [int(p) for p in z["paridade"]]
+        acc["niveis"] = [z[f"nivel_{h}"] for h in range(len(acc["paridade"]))]
+    acc["contagem"] = [np.count_nonzero(~np.isnan(nv), axis=2) for nv in acc["niveis"]]
+    return acc
+
+
+def quantis(acc: dict, qs: list[float]) -> np.ndarray:
+    """Consulta o sketch: retorna array (len(qs), n_grid, n_vars)."""
+    n_grid, n_vars = acc["n"].shape
+    if not acc["niveis"]:
+        return np.full((len(qs), n_grid, n_vars), np.nan)
+
+    itens = np.concatenate(acc["niveis"], axis=2)
+    pesos = np.concatenate([
+        np.full(nv.shape[2], 2.0 ** h) for h, nv in enumerate(acc["niveis"])
+    ])
+    pesos = np.where(np.isnan(itens), 0.0, pesos)
+
+    ordem = np.argsort(itens, axis=2)                 # NaN vão para o fim
+    itens = np.take_along_axis(itens, ordem, axis=2)
+    acum = np.cumsum(np.take_along_axis(pesos, ordem, axis=2), axis=2)
+    total = acum[:, :, -1:]
+
+    saida = np.full((len(qs), n_grid, n_vars), np.nan)
+    for i, q in enumerate(qs):
+        pos = (acum < q * total).sum(axis=2, keepdims=True)
+        pos = np.minimum(pos, itens.shape[2] - 1)
+        saida[i] = np.take_along_axis(itens, pos, axis=2)[:, :, 0]
+    saida[:, total[:, :, 0] == 0] = np.nan
+    return saida
+# ----------------------------------------------------------------
+
+
+def acumular_arquivos(caminhos: list[str], variaveis: list[str]) -> dict:
+    """Lê cada arquivo uma única vez (só as colunas necessárias) e acumula."""
+    acc = novo_acumulador(variaveis)
+    for caminho in caminhos:
+        nome = os.path.basename(caminho)
+        try:
+            colunas = pq.read_schema(caminho).names
+            col_t = detectar_coluna_tempo(colunas)
+            if col_t is None:
+                print(f"⚠️  Coluna de tempo não encontrada → {nome}. Pulando.")
+                continue
+            constantes = ler_constantes(caminho)
+            faltando = [v for v in variaveis if v not in colunas and v not in constantes]
+            if faltando:
+                print(f"⚠️  {nome}: sem {faltando}; valores tratados como ausentes.")
+            presentes = [v for v in variaveis if v in colunas]
+            df = pd.read_parquet(caminho, engine="pyarrow", columns=[col_t] + presentes)
+        except Exception as e:
+            print(f"❌ Erro lendo {nome}: {e}")
+            continue
+
+        tempo = pd.to_numeric(df[col_t], errors="coerce").to_numpy()
+        idx = np.rint((tempo - T_ORIGEM) / DT)
+        ok = ~np.isnan(idx) & (idx >= 0)
+        idx = idx[ok].astype(np.int64)
+
+        valores = np.full((idx.size, len(variaveis)), np.nan)
+        for j, v in enumerate(variaveis):
+            if v in df.columns:
+                valores[:, j] = pd.to_numeric(df[v], errors="coerce").to_numpy()[ok]
+            elif v in constantes:
+                valores[:, j] = constantes[v]
+
+        adicionar_cenario(acc, idx, valores)
+        print(f"✅ {nome:<38} | amostras: {idx.size:6d}")
+    return acc
+
+
+def montar_envelope(acc: dict) -> pd.DataFrame:
+    """Converte o acumulador em DataFrame longo (uma linha por tempo × variável)."""
+    n_grid, n_vars = acc["n"].shape
+    n = acc["n"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = np.where(n > 0, acc["media"], np.nan)
+        desvio = np.where(n > 1, np.sqrt(acc["m2"] / np.maximum(n - 1, 1)), np.nan)
+    minimo = np.where(n > 0, acc["minimo"], np.nan)
+    maximo = np.where(n > 0, acc["maximo"], np.nan)
+    pcts = quantis(acc, [p / 100.0 for p in PERCENTIS])
+
+    tempo = T_ORIGEM + np.arange(n_grid) * DT
+    dados = {
+        "tempo":    np.repeat(tempo, n_vars),
+        "variavel": np.tile(acc["variaveis"], n_grid),
+        "n":        n.ravel(),
+        "min":      minimo.ravel(),
+        "max":      maximo.ravel(),
+        "media":    media.ravel(),
+        "desvio":   desvio.ravel(),
+    }
+    for p, arr in zip(PERCENTIS, pcts):
+        dados[f"p{p}"] = arr.ravel()
+    return pd.DataFrame(dados)
+
+
+def plotar_envelope(df_env: pd.DataFrame, variavel: str) -> None:
+    d = df_env[(df_env["variavel"] == variavel) & (df_env["n"] > 0)]
+    if d.empty:
+        return
+    p_baixo, p_meio, p_alto = f"p{PERCENTIS[0]}", f"p{PERCENTIS[len(PERCENTIS) // 2]}", f"p{PERCENTIS[-1]}"
+
+    plt.figure(figsize=(12, 6))
+    plt.fill_between(d["tempo"], d["min"], d["max"], color="#90caf9", alpha=0.4, label="mín–máx")
+    plt.fill_between(d["tempo"], d[p_baixo], d[p_alto], color="#1e88e5", alpha=0.4,
+                     label=f"{p_baixo.upper()}–{p_alto.upper()}")
+    plt.plot(d["tempo"], d[p_meio], color="#0d47a1", label=p_meio.upper())
+    plt.plot(d["tempo"], d["media"], color="#e57373", linestyle="--", label="média")
+    plt.xlabel("Tempo (s)")
+    plt.ylabel("Valor")
+    plt.title(f"Envelope entre cenários — {variavel} (n máx. = {int(d['n'].max())})")
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+
+    outfile = os.path.join(pasta_out, f"envelope__{variavel}.png")
+    plt.savefig(outfile, dpi=150)
+    plt.close()
+    print(f"   ✅ Salvo: {outfile}")
+
+
+def finalizar(acc: dict) -> None:
+    """Gera o Parquet do envelope e os gráficos de faixas."""
+    df_env = montar_envelope(acc)
+    dst = os.path.join(pasta_out, ARQUIVO_ENVELOPE)
+    df_env.to_parquet(dst, index=False)
+    print(f"💾 Envelope salvo em {dst} ({len(df_env)} linhas)")
+
+    for variavel in acc["variaveis"]:
+        plotar_envelope(df_env, variavel)
+
+
+def mesclar_parciais(n_shards: int) -> int:
+    """
+    Mescla os acumuladores salvos pelos shards 1..N (apenas os desse N)
+    e gera o envelope final. Falha se algum deles estiver faltando.
+    """
+    arquivos = [
+        os.path.join(pasta_parciais, f"{rotulo_shard(i, n_shards)}.npz")
+        for i in range(1, n_shards + 1)
+    ]
+    faltando = [os.path.basename(a) for a in arquivos if not os.path.isfile(a)]
+    if faltando:
+        print(f"❌ Acumuladores parciais ausentes em {pasta_parciais}: {faltando}")
+        return 1
+    print(f"🔗 Mesclando {len(arquivos)} acumulador(es) parcial(is)")
+    acc = carregar_acumulador(arquivos[0])
+    for caminho in arquivos[1:]:
+        acc = mesclar(acc, carregar_acumulador(caminho))
+    if not acc["variaveis"]:
+        print(f"⚠️  Nenhuma coluna casa com {VARIAVEIS} nos shards.")
+        return 0
+    finalizar(acc)
+    return 0
+
+
+def salvar_parcial(acc: dict, shard: tuple[int, int]) -> None:
+    """Em modo shard, só o acumulador parcial é salvo (ver 0-run_pipeline.py --merge)."""
+    os.makedirs(pasta_parciais, exist_ok=True)
+    dst = os.path.join(pasta_parciais, f"{rotulo_shard(*shard)}.npz")
+    salvar_acumulador(acc, dst)
+    print(f"💾 Acumulador parcial salvo em {dst}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Envelope entre cenários (120 Hz).")
+    parser.add_argument(
+        "--mesclar-parciais", action="store_true",
+        help="Mescla os acumuladores parciais dos shards em vez de ler os Parquets."
+    )
+    parser.add_argument(
+        "--n-shards", type=int, default=None,
+        help="Número de shards (N) cujos acumuladores serão mesclados."
+    )
+    args = parser.parse_args()
+
+    os.makedirs(pasta_out, exist_ok=True)
+    if args.mesclar_parciais:
+        if not args.n_shards or args.n_shards < 1:
+            parser.error("--mesclar-parciais exige --n-shards N (N >= 1).")
+        codigo = mesclar_parciais(args.n_shards)
+        if codigo == 0:
+            print(f"\n🏁 Concluído. Verifique o envelope em {pasta_out}")
+        return codigo
+
+    shard = shard_atual()
+    if not os.path.isdir(pasta_in):
+        print(f"❌ Pasta de entrada não existe: {pasta_in}")
+        return 1
+    caminhos = glob.glob(os.path.join(pasta_in, "*.parquet"))
+    arquivos = sorted(c for c in caminhos if pertence_ao_shard(c))
+
+    # União das variáveis de todos os arquivos (só lê o schema)
+    variaveis: list[str] = []
+    for caminho in arquivos:
+        colunas = pq.read_schema(caminho).names + list(ler_constantes(caminho))
+        variaveis += [v for v in selecionar_variaveis(colunas) if v not in variaveis]
+
+    if not arquivos or not variaveis:
+        if not arquivos:
+            print(f"⚠️  Nenhum arquivo .parquet encontrado em {pasta_in}")
+        else:
+            print(f"⚠️  Nenhuma coluna casa com {VARIAVEIS}.")
+        if shard is not None:
+            # Shard vazio: acumulador vazio, para o merge encontrar os N parciais
+            salvar_parcial(novo_acumulador([]), shard)
+        return 0
+    print(f"🔍 {len(arquivos)} arquivo(s), {len(variaveis)} variável(is): {variaveis}")
+
+    n_proc = max(1, min(N_PROCESSOS, len(arquivos)))
+    if n_proc == 1:
+        acc = acumular_arquivos(arquivos, variaveis)
+    else:
+        blocos = [arquivos[i::n_proc] for i in range(n_proc)]
+        with ProcessPoolExecutor(max_workers=n_proc) as ex:
+            parciais = list(ex.map(acumular_arquivos, blocos, [variaveis] * n_proc))
+        acc = parciais[0]
+        for parcial in parciais[1:]:
+            acc = mesclar(acc, parcial)
+
+    if shard is not None:
+        salvar_parcial(acc, shard)
+        return 0
+
+    finalizar(acc)
+
+    print(f"\n🏁 Concluído. Verifique o envelope em {pasta_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
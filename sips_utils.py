@@ -0,0 +1,203 @@
+# ================================================================
+# Módulo: sips_utils.py
+# Autor: Bryan Ambrósio
+# Descrição:
+#   Funções compartilhadas entre os scripts da pipeline (importado por
+#   0-run_pipeline.py e pelas etapas 1 → 7, que rodam nesta pasta).
+#
+#   Shards (execução distribuída):
+#     - cenário → shard por CRC32 do nome base (estável entre máquinas),
+#       o mesmo para o .plt, o .parquet ou o nome já sem extensão;
+#     - SIPS_SHARD="i/N" é definido por 0-run_pipeline.py --shard.
+#
+#   Colunas constantes podadas (etapa 2):
+#     - guardadas como JSON nos metadados do Parquet (CHAVE_CONSTANTES);
+#     - repassadas pela etapa 5 e lidas pelas etapas 6 e 7.
+#
+#   Pirâmide mín./máx. (gráficos rápidos):
+#     - gravada pelas etapas 2 e 5 (<pasta>_piramide/<nome>.parquet);
+#     - lida pelas etapas 3 e 6, só no nível necessário para a figura.
+# ================================================================
+
+import os
+import json
+import zlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+VAR_AMBIENTE_SHARD = "SIPS_SHARD"
+CHAVE_CONSTANTES = "colunas_constantes"   # metadados do Parquet
+EXTENSOES_CENARIO = (".plt", ".parquet")  # removidas do nome antes do hash
+
+
+def parse_shard(valor: str) -> tuple[int, int]:
+    """Converte 'i/N' em (i, N), com 1 <= i <= N; ValueError se malformado."""
+    try:
+        i, n = (int(x) for x in valor.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard inválido '{valor}' (use i/N, ex.: 2/4).")
+    if not 1 <= i <= n:
+        raise ValueError(f"Shard inválido '{valor}': é preciso 1 <= i <= N.")
+    return i, n
+
+
+def nome_cenario(nome: str) -> str:
+    """
+    Nome base do cenário: sem pasta e sem extensão conhecida
+    (EXTENSOES_CENARIO). Outros pontos do nome são mantidos, então
+    'caso_1.5pu.plt', 'caso_1.5pu.parquet' e 'caso_1.5pu' dão 'caso_1.5pu'.
+    """
+    raiz, ext = os.path.splitext(os.path.basename(nome))
+    return raiz if ext.lower() in EXTENSOES_CENARIO else os.path.basename(nome)
+
+
+def shard_do_cenario(nome: str, n_shards: int) -> int:
+    """Shard (1..N) de um cenário: CRC32 do nome base (ver nome_cenario)."""
+    return zlib.crc32(nome_cenario(nome).encode("utf-8")) % n_shards + 1
+
+
+def rotulo_shard(i: int, n: int) -> str:
+    """Nome usado em pastas/arquivos por shard: 'shard_i_de_N'."""
+    return f"shard_{i}_de_{n}"
+
+
+def shard_atual() -> tuple[int, int] | None:
+    """(i, N) de SIPS_SHARD, ou None fora do modo shard."""
+    valor = os.environ.get(VAR_AMBIENTE_SHARD)
+    return parse_shard(valor) if valor else None
+
+
+def pertence_ao_shard(nome: str) -> bool:
+    """True se o cenário pertence ao shard atual (sempre True sem SIPS_SHARD)."""
+    shard = shard_atual()
+    if shard is None:
+        return True
+    i, n = shard
+    return shard_do_cenario(nome, n) == i
+
+
+# -------------------- Colunas constantes -------------------------
+
+def ler_constantes(caminho: str) -> dict[str, float]:
+    """Colunas constantes podadas na conversão (metadados do Parquet)."""
+    meta = pq.read_schema(caminho).metadata or {}
+    return json.loads(meta.get(CHAVE_CONSTANTES.encode(), b"{}"))
+
+
+def salvar_parquet(df: pd.DataFrame, dst: str, constantes: dict[str, float]) -> None:
+    """Salva o DataFrame; as constantes vão como JSON nos metadados do schema."""
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    if constantes:
+        meta = dict(tabela.schema.metadata or {})
+        meta[CHAVE_CONSTANTES.encode()] = json.dumps(constantes).encode()
+        tabela = tabela.replace_schema_metadata(meta)
+    # Você pode adicionar compression='snappy' se desejar compactar:
+    pq.write_table(tabela, dst)
+
+
+# ------------------------- Pirâmide ------------------------------
+
+def _reduzir_pares(a: np.ndarray, func: np.ufunc) -> np.ndarray:
+    """Reduz linhas consecutivas aos pares (a última fica sozinha se for ímpar)."""
+    if a.shape[0] % 2:
+        a = np.concatenate([a, np.full((1,) + a.shape[1:], np.nan)])
+    return func.reduce(a.reshape((-1, 2) + a.shape[1:]), axis=1)
+
+
+def remover_piramide(dst: str) -> None:
+    """Apaga a pirâmide de uma execução anterior (evita ler uma pirâmide velha)."""
+    if os.path.isfile(dst):
+        os.remove(dst)
+
+
+def salvar_piramide(df: pd.DataFrame, col_t: str, dst: str, min_baldes: int) -> None:
+    """
+    Grava a pirâmide mín./máx. (níveis 2×, 4×, ...) de todas as colunas.
+    Cada nível é um row group com t_ini, t_fim, <col>__min e <col>__max,
+    permitindo ler só o nível necessário para o gráfico. O nível mais
+    grosso tem ao menos `min_baldes` baldes; se nem o 2× cabe, não grava
+    (e apaga a pirâmide anterior, se houver).
+    """
+    colunas = [c for c in df.columns if c != col_t]
+    t = df[col_t].to_numpy(dtype=float)
+    t_ini, t_fim = t, t
+    mins = maxs = df[colunas].to_numpy(dtype=float)
+
+    niveis: list[pa.Table] = []
+    fatores: list[int] = []
+    fator = 1
+    while mins.shape[0] // 2 >= min_baldes:
+        fator *= 2
+        t_ini, t_fim = _reduzir_pares(t_ini, np.fmin), _reduzir_pares(t_fim, np.fmax)
+        mins, maxs = _reduzir_pares(mins, np.fmin), _reduzir_pares(maxs, np.fmax)
+        dados = {"t_ini": t_ini, "t_fim": t_fim}
+        for j, c in enumerate(colunas):
+            dados[f"{c}__min"] = mins[:, j]
+            dados[f"{c}__max"] = maxs[:, j]
+        niveis.append(pa.table(dados))
+        fatores.append(fator)
+    if not niveis:
+        remover_piramide(dst)
+        return
+
+    meta = {
+        "fatores": fatores,
+        "n_amostras": int(t.size),
+        "coluna_tempo": col_t,
+        "colunas": colunas,
+        "t_min": float(np.nanmin(t)),
+        "t_max": float(np.nanmax(t)),
+    }
+    schema = niveis[0].schema.with_metadata({b"piramide": json.dumps(meta).encode()})
+    with pq.ParquetWriter(dst, schema) as writer:
+        for tabela in niveis:
+            writer.write_table(tabela.cast(schema), row_group_size=tabela.num_rows)
+
+
+def carregar_para_plot(caminho: str, pasta_piramide: str, janela: tuple[float, float] | None,
+                       largura_px: int, colunas: list[str] | None = None) -> tuple[pd.DataFrame, bool]:
+    """
+    Lê os dados para plotar a janela de tempo na largura (pixels) indicada.
+    Usa o nível mais grosso da pirâmide mín./máx. que ainda tem pelo menos
+    um balde por pixel DENTRO da janela (contado pelos t_ini/t_fim do nível,
+    pois o passo do .PLT é adaptativo); se não houver pirâmide, se ela
+    estiver desatualizada (nº de linhas diferente do Parquet ou arquivo mais
+    antigo que ele) ou se nenhum nível servir, lê as amostras exatas.
+    Retorna (df, exato).
+    """
+    caminho_pir = os.path.join(pasta_piramide, os.path.basename(caminho))
+    if os.path.isfile(caminho_pir) and os.path.getmtime(caminho_pir) >= os.path.getmtime(caminho):
+        arq_pir = pq.ParquetFile(caminho_pir)
+        meta = json.loads(arq_pir.schema_arrow.metadata[b"piramide"])
+        if meta["n_amostras"] != pq.ParquetFile(caminho).metadata.num_rows:
+            print(f"   ⚠️ Pirâmide desatualizada, ignorada: {caminho_pir}")
+            return pd.read_parquet(caminho, engine="pyarrow", columns=colunas), True
+        col_t = meta["coluna_tempo"]
+        dados_cols = [c for c in (colunas or meta["colunas"]) if c != col_t]
+        if set(dados_cols) <= set(meta["colunas"]):
+            # Do nível mais grosso ao mais fino; níveis com menos baldes que
+            # pixels no arquivo todo são descartados sem ler nada
+            for k in reversed(range(len(meta["fatores"]))):
+                if arq_pir.metadata.row_group(k).num_rows < largura_px:
+                    continue
+                tempos = arq_pir.read_row_group(k, columns=["t_ini", "t_fim"])
+                t_ini = tempos.column("t_ini").to_numpy()
+                t_fim = tempos.column("t_fim").to_numpy()
+                if janela is None:
+                    dentro = np.ones(t_ini.size, dtype=bool)
+                else:
+                    dentro = (t_fim >= janela[0]) & (t_ini <= janela[1])
+                if np.count_nonzero(dentro) < largura_px:
+                    continue
+                nomes = [f"{c}__{s}" for c in dados_cols for s in ("min", "max")]
+                nivel = arq_pir.read_row_group(k, columns=nomes).to_pandas()[dentro]
+                # Zigue-zague (t_ini, mín.) → (t_fim, máx.) por balde: na resolução
+                # do pixel desenha o mesmo envelope que a série completa.
+                dados = {col_t: np.column_stack([t_ini[dentro], t_fim[dentro]]).ravel()}
+                for c in dados_cols:
+                    dados[c] = np.column_stack([nivel[f"{c}__min"], nivel[f"{c}__max"]]).ravel()
+                return pd.DataFrame(dados), False
+
+    return pd.read_parquet(caminho, engine="pyarrow", columns=colunas), True